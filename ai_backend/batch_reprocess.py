@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+"""
+Batch re-transcription / re-analysis of historical calls for Bayti AI Backend
+
+Streams candidate rows from ai_calls through a server-side cursor, fetches and
+transcribes recordings (or re-runs lead extraction on stored transcriptions)
+with bounded concurrency, normalizes audio in a process pool, and writes
+results back in bulk. Progress is checkpointed after every batch so an
+interrupted run resumes where it left off; rows that failed are recorded in
+the checkpoint and retried first on the next run.
+
+Full-recording transcriptions go to ai_calls.retranscription, leaving the
+per-turn transcription the live agent uses untouched; lead extraction goes to
+ai_calls.lead_analysis. Both columns are created by main.init_db.
+
+Usage:
+  python batch_reprocess.py transcribe [--since 2025-08-01] [--limit N]
+  python batch_reprocess.py analyze --concurrency 32
+  python batch_reprocess.py transcribe --fake-providers   # no network calls
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import wave
+import asyncio
+import argparse
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import psycopg2
+import psycopg2.extras
+import httpx
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+TWILIO_ACCOUNT_SID = os.getenv("TWILIO_ACCOUNT_SID")
+TWILIO_AUTH_TOKEN = os.getenv("TWILIO_AUTH_TOKEN")
+DATABASE_URL = os.getenv("DATABASE_URL")
+
+CHECKPOINT_DIR = Path(__file__).parent / "batch_checkpoints"
+
+LEAD_EXTRACTION_PROMPT = """You extract real estate lead details from a phone call transcription.
+Return a JSON object with the keys: location, budget, property_type, features, next_step.
+Use null for anything the caller did not mention."""
+
+
+def prepare_audio(audio: bytes) -> bytes:
+    """Normalize a WAV recording to 16kHz mono 16-bit (runs in a worker process)"""
+    from pydub import AudioSegment
+
+    segment = AudioSegment.from_file(io.BytesIO(audio), format="wav")
+    segment = segment.set_frame_rate(16000).set_channels(1).set_sample_width(2)
+    out = io.BytesIO()
+    segment.export(out, format="wav")
+    return out.getvalue()
+
+
+def wav_duration(audio: bytes) -> float:
+    with wave.open(io.BytesIO(audio)) as wav:
+        return wav.getnframes() / float(wav.getframerate())
+
+
+class LiveProviders:
+    """Twilio recordings + OpenAI Whisper / GPT-4o mini"""
+
+    def __init__(self):
+        import openai
+
+        self.http = httpx.AsyncClient(timeout=60, auth=(TWILIO_ACCOUNT_SID or "", TWILIO_AUTH_TOKEN or ""))
+        self.openai = openai.AsyncOpenAI(api_key=OPENAI_API_KEY)
+
+    async def fetch_recording(self, call_sid: str) -> bytes:
+        """Audio of the call's first recording, or None if it has none"""
+        base = f"https://api.twilio.com/2010-04-01/Accounts/{TWILIO_ACCOUNT_SID}"
+        response = await self.http.get(f"{base}/Calls/{call_sid}/Recordings.json")
+        response.raise_for_status()
+        recordings = response.json().get("recordings", [])
+        if not recordings:
+            return None
+        media = await self.http.get(f"{base}/Recordings/{recordings[0]['sid']}.wav")
+        media.raise_for_status()
+        return media.content
+
+    async def transcribe(self, audio: bytes) -> str:
+        transcript = await self.openai.audio.transcriptions.create(
+            model="whisper-1",
+            file=("recording.wav", audio)
+        )
+        return transcript.text
+
+    async def analyze(self, transcription: str) -> str:
+        response = await self.openai.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=[
+                {"role": "system", "content": LEAD_EXTRACTION_PROMPT},
+                {"role": "user", "content": transcription}
+            ],
+            response_format={"type": "json_object"},
+            temperature=0
+        )
+        return response.choices[0].message.content
+
+    async def close(self):
+        await self.http.aclose()
+        await self.openai.close()
+
+
+class FakeProviders:
+    """Local stand-ins that return deterministic data without network access"""
+
+    def __init__(self, latency: float = 0.01):
+        self.latency = latency
+
+    async def fetch_recording(self, call_sid: str) -> bytes:
+        await asyncio.sleep(self.latency)
+        out = io.BytesIO()
+        with wave.open(out, "wb") as wav:
+            wav.setnchannels(2)
+            wav.setsampwidth(2)
+            wav.setframerate(8000)
+            wav.writeframes(b"\x00\x00" * 2 * 8000)
+        return out.getvalue()
+
+    async def transcribe(self, audio: bytes) -> str:
+        await asyncio.sleep(self.latency)
+        return f"Fake transcription of {wav_duration(audio):.1f}s of audio"
+
+    async def analyze(self, transcription: str) -> str:
+        await asyncio.sleep(self.latency)
+        return json.dumps({"location": None, "budget": None, "property_type": None,
+                           "features": None, "next_step": None, "chars": len(transcription)})
+
+    async def close(self):
+        pass
+
+
+class Checkpoint:
+    """Last scanned (created_at, id) position and ids of rows that failed, persisted as JSON"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.position = None
+        self.stats = {}
+        self.failed = []
+        if self.path.exists():
+            data = json.loads(self.path.read_text())
+            self.position = data.get("position")
+            self.stats = data.get("stats", {})
+            self.failed = data.get("failed", [])
+
+    def save(self, position, stats: dict, failed: list):
+        self.position = position
+        self.stats = stats
+        self.failed = failed
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps({"position": position, "stats": stats, "failed": failed}))
+        tmp_path.replace(self.path)
+
+
+class BatchReprocessor:
+    def __init__(self, mode: str, providers, checkpoint: Checkpoint, concurrency: int = 16,
+                 batch_size: int = 200, workers: int = None, since: str = None, limit: int = None):
+        self.mode = mode
+        self.providers = providers
+        self.checkpoint = checkpoint
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.batch_size = batch_size
+        self.workers = workers
+        self.since = since
+        self.limit = limit
+
+        self.stats = {"rows": 0, "updated": 0, "skipped": 0, "failed": 0, "retried": 0, "audio_seconds": 0.0,
+                      "fetch_s": 0.0, "prep_s": 0.0, "provider_s": 0.0, "write_s": 0.0}
+        self.stats.update(checkpoint.stats)
+        self.failed = set(checkpoint.failed)
+        self.resumed_rows = self.stats["rows"]
+        self.started = time.monotonic()
+        self.pool = None
+
+    def candidate_query(self, ids=None):
+        """Scan query from the checkpoint position, or for just `ids` when retrying failures"""
+        # Rows without created_at have no checkpoint position, so they are not scanned
+        conditions = ["call_sid IS NOT NULL", "created_at IS NOT NULL"]
+        params = []
+        if self.mode == "analyze":
+            conditions.append("COALESCE(retranscription, transcription) IS NOT NULL")
+        if self.since:
+            conditions.append("created_at >= %s")
+            params.append(self.since)
+        if ids is not None:
+            conditions.append("id = ANY(%s::uuid[])")
+            params.append(list(ids))
+        elif self.checkpoint.position:
+            conditions.append("(created_at, id) > (%s::timestamp, %s::uuid)")
+            params.extend(self.checkpoint.position)
+        sql = f"""
+            SELECT id, call_sid, COALESCE(retranscription, transcription), created_at
+            FROM ai_calls
+            WHERE {' AND '.join(conditions)}
+            ORDER BY created_at, id
+        """
+        if self.limit and ids is None:
+            sql += " LIMIT %s"
+            params.append(self.limit)
+        return sql, params
+
+    async def process_row(self, row) -> tuple:
+        """Returns (call_sid, result) or (call_sid, None) when skipped/failed; failures are kept for retry"""
+        row_id, call_sid, transcription, _ = row
+        row_id = str(row_id)
+        async with self.semaphore:
+            try:
+                if self.mode == "analyze":
+                    started = time.monotonic()
+                    result = await self.providers.analyze(transcription)
+                    self.stats["provider_s"] += time.monotonic() - started
+                    self.failed.discard(row_id)
+                    return call_sid, result
+
+                started = time.monotonic()
+                audio = await self.providers.fetch_recording(call_sid)
+                self.stats["fetch_s"] += time.monotonic() - started
+                if audio is None:
+                    self.stats["skipped"] += 1
+                    self.failed.discard(row_id)
+                    return call_sid, None
+
+                started = time.monotonic()
+                loop = asyncio.get_running_loop()
+                audio = await loop.run_in_executor(self.pool, prepare_audio, audio)
+                self.stats["prep_s"] += time.monotonic() - started
+                self.stats["audio_seconds"] += wav_duration(audio)
+
+                started = time.monotonic()
+                result = await self.providers.transcribe(audio)
+                self.stats["provider_s"] += time.monotonic() - started
+                self.failed.discard(row_id)
+                return call_sid, result
+            except Exception as e:
+                logger.error(f"Reprocessing {call_sid} failed: {e}")
+                self.failed.add(row_id)
+                return call_sid, None
+
+    def write_results(self, conn, results):
+        column = "retranscription" if self.mode == "transcribe" else "lead_analysis"
+        cur = conn.cursor()
+        psycopg2.extras.execute_values(cur, f"""
+            UPDATE ai_calls AS c
+            SET {column} = v.result, updated_at = CURRENT_TIMESTAMP
+            FROM (VALUES %s) AS v(call_sid, result)
+            WHERE c.call_sid = v.call_sid
+        """, results, page_size=500)
+        conn.commit()
+        cur.close()
+
+    async def run(self):
+        read_conn = psycopg2.connect(DATABASE_URL)
+        write_conn = psycopg2.connect(DATABASE_URL)
+        self.pool = ProcessPoolExecutor(max_workers=self.workers)
+        try:
+            # Rows that failed last time go first; any that fail again stay recorded
+            if self.failed:
+                retry_ids = sorted(self.failed)
+                logger.info(f"Retrying {len(retry_ids)} previously failed rows")
+                retried = await self.scan(read_conn, write_conn, "batch_reprocess_retry",
+                                          *self.candidate_query(retry_ids), resume=False)
+                # Rows deleted or no longer eligible since the last run can't be retried
+                self.failed -= set(retry_ids) - retried
+                self.stats["failed"] = len(self.failed)
+                self.checkpoint.save(self.checkpoint.position, self.stats, sorted(self.failed))
+            await self.scan(read_conn, write_conn, "batch_reprocess_scan", *self.candidate_query())
+        finally:
+            self.pool.shutdown()
+            read_conn.close()
+            write_conn.close()
+            await self.providers.close()
+
+        self.report(final=True)
+
+    async def scan(self, read_conn, write_conn, cursor_name: str, sql: str, params, resume: bool = True):
+        """Process query results batch by batch, checkpointing after each write
+
+        With resume=False (retry pass) the position is left alone and the ids
+        scanned are returned.
+        """
+        # Named cursor keeps the result set on the server; rows arrive batch by batch
+        scan = read_conn.cursor(name=cursor_name)
+        scan.itersize = self.batch_size
+        await asyncio.to_thread(scan.execute, sql, params)
+        scanned = set()
+
+        while True:
+            rows = await asyncio.to_thread(scan.fetchmany, self.batch_size)
+            if not rows:
+                break
+
+            outcomes = await asyncio.gather(*(self.process_row(row) for row in rows))
+            results = [(call_sid, result) for call_sid, result in outcomes if result is not None]
+
+            started = time.monotonic()
+            if results:
+                await asyncio.to_thread(self.write_results, write_conn, results)
+            self.stats["write_s"] += time.monotonic() - started
+            self.stats["updated"] += len(results)
+            self.stats["failed"] = len(self.failed)
+
+            position = self.checkpoint.position
+            if resume:
+                self.stats["rows"] += len(rows)
+                last = rows[-1]
+                position = [last[3].isoformat(), str(last[0])]
+            else:
+                self.stats["retried"] += len(rows)
+                scanned.update(str(row[0]) for row in rows)
+            self.checkpoint.save(position, self.stats, sorted(self.failed))
+            self.report()
+
+        scan.close()
+        return scanned
+
+    def report(self, final: bool = False):
+        elapsed = time.monotonic() - self.started
+        rate = (self.stats["rows"] - self.resumed_rows) / elapsed if elapsed else 0.0
+        label = "Finished" if final else "Progress"
+        print(
+            f"{label}: {self.stats['rows']} rows ({rate:.1f}/s), {self.stats['updated']} updated, "
+            f"{self.stats['skipped']} skipped, {self.stats['failed']} failed, {self.stats['retried']} retried, "
+            f"{self.stats['audio_seconds']:.0f}s audio"
+        )
+        if final:
+            busy = ", ".join(f"{stage} {self.stats[stage]:.1f}s" for stage in ("fetch_s", "prep_s", "provider_s", "write_s"))
+            print(f"Stage time (summed across tasks): {busy}; wall clock {elapsed:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-run transcription or lead extraction over past calls")
+    parser.add_argument("mode", choices=["transcribe", "analyze"])
+    parser.add_argument("--since", help="only calls created on/after this date")
+    parser.add_argument("--limit", type=int, help="maximum rows to process")
+    parser.add_argument("--concurrency", type=int, default=16, help="concurrent provider requests")
+    parser.add_argument("--batch-size", type=int, default=200, help="rows per fetch/write/checkpoint")
+    parser.add_argument("--workers", type=int, help="audio prep processes (default: CPU count)")
+    parser.add_argument("--checkpoint", help="checkpoint file (default: batch_checkpoints/<mode>.json)")
+    parser.add_argument("--restart", action="store_true", help="ignore any existing checkpoint")
+    parser.add_argument("--fake-providers", action="store_true", help="use local fake providers")
+    args = parser.parse_args()
+
+    checkpoint_path = Path(args.checkpoint) if args.checkpoint else CHECKPOINT_DIR / f"{args.mode}.json"
+    if args.restart and checkpoint_path.exists():
+        checkpoint_path.unlink()
+    checkpoint = Checkpoint(checkpoint_path)
+    if checkpoint.position:
+        print(f"Resuming after {checkpoint.position[0]} ({checkpoint.stats.get('rows', 0)} rows done)")
+    if checkpoint.failed:
+        print(f"Retrying {len(checkpoint.failed)} rows that failed on the previous run")
+
+    providers = FakeProviders() if args.fake_providers else LiveProviders()
+    job = BatchReprocessor(
+        args.mode, providers, checkpoint,
+        concurrency=args.concurrency,
+        batch_size=args.batch_size,
+        workers=args.workers,
+        since=args.since,
+        limit=args.limit
+    )
+    try:
+        asyncio.run(job.run())
+    except KeyboardInterrupt:
+        print("Interrupted; rerun the same command to resume from the last checkpoint")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
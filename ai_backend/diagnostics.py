@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Opt-in runtime diagnostics for Bayti AI Backend
+Detects event-loop stalls and samples per-endpoint CPU profiles
+
+Enable with BAYTI_DIAGNOSTICS=1. Tunables:
+  BAYTI_STALL_THRESHOLD_MS  loop lag that triggers a stack snapshot (default 250)
+  BAYTI_PROFILE_HZ          stack samples per second, 0 disables (default 10)
+  BAYTI_ADMIN_TOKEN         required as X-Admin-Token on admin routes; they are
+                            refused entirely while it is unset
+"""
+
+import os
+import hmac
+import sys
+import time
+import asyncio
+import threading
+import traceback
+import logging
+from collections import Counter, defaultdict
+
+from fastapi import Request, HTTPException
+from fastapi.responses import PlainTextResponse
+
+logger = logging.getLogger(__name__)
+
+DIAGNOSTICS_ENABLED = os.getenv("BAYTI_DIAGNOSTICS", "").lower() in ("1", "true", "yes")
+STALL_THRESHOLD_MS = float(os.getenv("BAYTI_STALL_THRESHOLD_MS", "250"))
+PROFILE_HZ = float(os.getenv("BAYTI_PROFILE_HZ", "10"))
+ADMIN_TOKEN = os.getenv("BAYTI_ADMIN_TOKEN")
+
+HEARTBEAT_INTERVAL = 0.05
+MAX_STACK_DEPTH = 64
+MAX_PROFILE_LABELS = 200
+
+
+def _folded_stack(frame) -> str:
+    """Render a frame chain root-first as a ';'-joined flamegraph key"""
+    names = []
+    while frame is not None and len(names) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class LoopMonitor:
+    """Watches one event loop from a helper thread"""
+
+    def __init__(self, threshold_ms: float = STALL_THRESHOLD_MS, profile_hz: float = PROFILE_HZ):
+        self.threshold = threshold_ms / 1000
+        self.profile_interval = 1 / profile_hz if profile_hz > 0 else None
+        self.loop = None
+        self.loop_thread_id = None
+        self.last_beat = time.monotonic()
+        self.should_run = False
+
+        # Lag statistics
+        self.max_lag = 0.0
+        self.stall_count = 0
+        self.last_stall_stack = None
+
+        # Task -> ASGI scope of the request it is handling; the label is read
+        # from the matched route template so path parameters don't add keys
+        self.active_requests = {}
+        self.profiles = defaultdict(Counter)
+        self.sample_count = 0
+
+    async def start(self):
+        self.loop = asyncio.get_running_loop()
+        self.loop_thread_id = threading.get_ident()
+        self.last_beat = time.monotonic()
+        self.should_run = True
+        self.loop.create_task(self._heartbeat())
+
+        watchdog = threading.Thread(target=self._watch, name="loop-watchdog")
+        watchdog.daemon = True
+        watchdog.start()
+        logger.info(
+            f"Diagnostics enabled: stall threshold {self.threshold * 1000:.0f}ms, "
+            f"profiling {'off' if self.profile_interval is None else f'{1 / self.profile_interval:g}Hz'}"
+        )
+
+    def stop(self):
+        self.should_run = False
+
+    async def _heartbeat(self):
+        """Record when the loop last got to run us; the gap past the sleep is lag"""
+        while self.should_run:
+            before = time.monotonic()
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+            now = time.monotonic()
+            lag = now - before - HEARTBEAT_INTERVAL
+            if lag > self.max_lag:
+                self.max_lag = lag
+            self.last_beat = now
+
+    def _watch(self):
+        """Snapshot the loop thread's stack while it is stalled, and sample it for profiles"""
+        in_stall = False
+        next_sample = time.monotonic()
+        tick = min(self.threshold / 4, self.profile_interval or self.threshold)
+
+        while self.should_run:
+            time.sleep(tick)
+            now = time.monotonic()
+            frame = sys._current_frames().get(self.loop_thread_id)
+            if frame is None:
+                continue
+
+            stalled_for = now - self.last_beat - HEARTBEAT_INTERVAL
+            if stalled_for > self.threshold:
+                if not in_stall:
+                    in_stall = True
+                    self.stall_count += 1
+                    self.last_stall_stack = "".join(traceback.format_stack(frame))
+                    logger.warning(
+                        f"Event loop blocked for {stalled_for * 1000:.0f}ms "
+                        f"in {self._current_endpoint()}:\n{self.last_stall_stack}"
+                    )
+            else:
+                in_stall = False
+
+            if self.profile_interval is not None and now >= next_sample:
+                next_sample = now + self.profile_interval
+                self.profiles[self._current_endpoint()][_folded_stack(frame)] += 1
+                self.sample_count += 1
+
+    def _current_endpoint(self) -> str:
+        try:
+            task = asyncio.current_task(self.loop)
+        except RuntimeError:
+            task = None
+        scope = self.active_requests.get(task)
+        if scope is None:
+            return "(idle)"
+        route = scope.get("route")
+        path = getattr(route, "path", None) or "(unmatched)"
+        label = f"{scope['method']} {path}"
+        if label not in self.profiles and len(self.profiles) >= MAX_PROFILE_LABELS:
+            return "(other)"
+        return label
+
+    def folded(self, endpoint: str = None) -> str:
+        """Collapsed-stack output for flamegraph.pl / speedscope / inferno"""
+        lines = []
+        for label, stacks in list(self.profiles.items()):
+            if endpoint and label != endpoint:
+                continue
+            for stack, count in list(stacks.items()):
+                lines.append(f"{label};{stack} {count}")
+        return "\n".join(lines) + "\n"
+
+    def stats(self) -> dict:
+        return {
+            "stall_threshold_ms": self.threshold * 1000,
+            "current_lag_ms": max(0.0, time.monotonic() - self.last_beat - HEARTBEAT_INTERVAL) * 1000,
+            "max_lag_ms": self.max_lag * 1000,
+            "stall_count": self.stall_count,
+            "last_stall_stack": self.last_stall_stack,
+            "profile_samples": self.sample_count,
+            "endpoints": {label: sum(stacks.values()) for label, stacks in list(self.profiles.items())},
+        }
+
+
+class RequestTagMiddleware:
+    """Plain ASGI middleware so the endpoint runs in the same task we tag"""
+
+    def __init__(self, app, monitor: LoopMonitor):
+        self.app = app
+        self.monitor = monitor
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        task = asyncio.current_task()
+        self.monitor.active_requests[task] = scope
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.monitor.active_requests.pop(task, None)
+
+
+def _check_admin(request: Request):
+    # Stack traces must never be served from the public webhook host unauthenticated
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Set BAYTI_ADMIN_TOKEN to use diagnostics routes")
+    if not hmac.compare_digest(request.headers.get("X-Admin-Token", ""), ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+
+def install_diagnostics(app, monitor: LoopMonitor = None):
+    """Attach the loop monitor, request tagging middleware and admin routes to app"""
+    if monitor is None:
+        monitor = LoopMonitor()
+    if not ADMIN_TOKEN:
+        logger.warning("BAYTI_ADMIN_TOKEN is not set; diagnostics admin routes will refuse all requests")
+
+    @app.on_event("startup")
+    async def start_monitor():
+        await monitor.start()
+
+    @app.on_event("shutdown")
+    async def stop_monitor():
+        monitor.stop()
+
+    app.add_middleware(RequestTagMiddleware, monitor=monitor)
+
+    @app.get("/admin/diagnostics")
+    async def diagnostics_stats(request: Request):
+        """Event-loop lag and profiler summary"""
+        _check_admin(request)
+        return monitor.stats()
+
+    @app.get("/admin/profile")
+    async def diagnostics_profile(request: Request, endpoint: str = None, reset: bool = False):
+        """Sampled stacks in collapsed flamegraph format"""
+        _check_admin(request)
+        body = monitor.folded(endpoint)
+        if reset:
+            monitor.profiles.clear()
+        return PlainTextResponse(body)
+
+    return monitor
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Liveness and readiness checks for Bayti AI Backend
+Dependency probes are cached and single-flight so health polling stays cheap
+"""
+
+import time
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+PROBE_TTL = 10
+PROBE_TIMEOUT = 2
+
+
+class DependencyProbe:
+    """One dependency check whose result is reused for `ttl` seconds"""
+
+    def __init__(self, name: str, check, critical: bool = True, ttl: float = PROBE_TTL,
+                 timeout: float = PROBE_TIMEOUT):
+        # check is an async callable returning None when healthy or raising on failure
+        self.name = name
+        self.check = check
+        self.critical = critical
+        self.ttl = ttl
+        self.timeout = timeout
+        self.lock = asyncio.Lock()
+        self.checked_at = 0.0
+        self.result = {"ok": False, "error": "not checked yet"}
+
+    async def status(self) -> dict:
+        if time.monotonic() - self.checked_at < self.ttl:
+            return self.result
+        async with self.lock:
+            # Another request may have refreshed while we waited
+            if time.monotonic() - self.checked_at < self.ttl:
+                return self.result
+            started = time.monotonic()
+            try:
+                await asyncio.wait_for(self.check(), timeout=self.timeout)
+                self.result = {"ok": True}
+            except asyncio.TimeoutError:
+                self.result = {"ok": False, "error": f"timed out after {self.timeout}s"}
+            except Exception as e:
+                self.result = {"ok": False, "error": str(e) or type(e).__name__}
+            self.result["latency_ms"] = round((time.monotonic() - started) * 1000, 1)
+            self.result["critical"] = self.critical
+            if not self.result["ok"]:
+                logger.warning(f"Readiness probe {self.name} failed: {self.result['error']}")
+            self.checked_at = time.monotonic()
+            return self.result
+
+
+class ReadinessChecker:
+    """Aggregates dependency probes; ready when every critical probe passes"""
+
+    def __init__(self, probes=None):
+        self.probes = list(probes or [])
+
+    def add(self, probe: DependencyProbe):
+        self.probes.append(probe)
+
+    async def check(self) -> dict:
+        results = await asyncio.gather(*(probe.status() for probe in self.probes))
+        dependencies = {probe.name: result for probe, result in zip(self.probes, results)}
+        ready = all(r["ok"] for r in results if r["critical"])
+        degraded = not all(r["ok"] for r in results)
+        return {
+            "status": ("degraded" if degraded else "ready") if ready else "not_ready",
+            "ready": ready,
+            "dependencies": dependencies,
+        }
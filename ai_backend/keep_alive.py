@@ -9,20 +9,23 @@ import time
 import signal
 import sys
 import os
-import threading
 from pathlib import Path
 
+from log_pipeline import LogPipeline
+
 class ServerKeepAlive:
     def __init__(self):
         self.process = None
         self.should_restart = True
         self.restart_delay = 3
+        self.logs = LogPipeline(name="keep_alive")
         
     def signal_handler(self, sig, frame):
         print('Shutting down server...')
         self.should_restart = False
         if self.process:
             self.process.terminate()
+        self.logs.stop()
         sys.exit(0)
         
     def start_server(self):
@@ -39,21 +42,11 @@ class ServerKeepAlive:
             self.process = subprocess.Popen(
                 cmd,
                 stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                universal_newlines=True,
-                bufsize=1
+                stderr=subprocess.STDOUT
             )
             
-            # Stream output in real-time
-            def stream_output():
-                if self.process and self.process.stdout:
-                    for line in iter(self.process.stdout.readline, ''):
-                        if line.strip():
-                            print(f"[SERVER] {line.strip()}")
-            
-            output_thread = threading.Thread(target=stream_output)
-            output_thread.daemon = True
-            output_thread.start()
+            # Drain output without ever blocking the server on a slow consumer
+            self.logs.attach(self.process.stdout)
             
             return self.process
             
@@ -70,6 +63,8 @@ class ServerKeepAlive:
         print("Server will automatically restart on crashes")
         print("Press Ctrl+C to stop")
         
+        self.logs.start()
+        
         while self.should_restart:
             print(f"\n[{time.strftime('%Y-%m-%d %H:%M:%S')}] Starting server...")
             
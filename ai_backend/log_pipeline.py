@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+Non-blocking log pipeline for the Bayti AI Backend supervisors
+Drains server output into rotated JSON-lines files and a crash-triage ring buffer
+
+The reader thread only moves raw bytes off the pipe into a bounded buffer,
+so a slow console or disk can never fill the pipe and block the server.
+When the buffer is full incoming output is dropped up to the next line
+boundary and a single "dropped" record marks the gap.
+
+Query the ring buffer of a running supervisor with:
+  python log_pipeline.py supervisor tail [N]
+  python log_pipeline.py supervisor stats
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import threading
+import socketserver
+from collections import deque
+from pathlib import Path
+
+LOG_DIR = Path(os.getenv("BAYTI_LOG_DIR", Path(__file__).parent / "logs"))
+ADMIN_SOCKET = os.getenv("BAYTI_LOG_SOCKET")
+
+READ_CHUNK = 64 * 1024
+MAX_PENDING_CHUNKS = 1024
+FLUSH_INTERVAL = 0.2
+STOP_TIMEOUT = 2
+MAX_FILE_BYTES = 10 * 1024 * 1024
+BACKUP_COUNT = 5
+RING_SIZE = 2000
+
+_LEVEL_PREFIXES = ("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL")
+
+
+def parse_line(line: str) -> dict:
+    """Turn one server output line into a structured record"""
+    if line.startswith("{"):
+        try:
+            record = json.loads(line)
+            if isinstance(record, dict):
+                record.setdefault("ts", time.time())
+                return record
+        except ValueError:
+            pass
+
+    level = "INFO"
+    for prefix in _LEVEL_PREFIXES:
+        if line.startswith(prefix):
+            level = prefix
+            break
+    return {"ts": time.time(), "level": level, "msg": line}
+
+
+class _Gap:
+    """Marks where the reader discarded output while the buffer was full"""
+
+    def __init__(self, dropped_bytes: int):
+        self.dropped_bytes = dropped_bytes
+
+
+class RotatingWriter:
+    """Size-capped append-only file with numbered backups"""
+
+    def __init__(self, path: Path, max_bytes: int = MAX_FILE_BYTES, backup_count: int = BACKUP_COUNT):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.file = open(self.path, "ab")
+        self.size = self.file.tell()
+
+    def write(self, data: bytes):
+        if self.size and self.size + len(data) > self.max_bytes:
+            self.rotate()
+        self.file.write(data)
+        self.file.flush()
+        self.size += len(data)
+
+    def rotate(self):
+        self.file.close()
+        for i in range(self.backup_count - 1, 0, -1):
+            src = self.path.with_name(f"{self.path.name}.{i}")
+            if src.exists():
+                src.replace(self.path.with_name(f"{self.path.name}.{i + 1}"))
+        if self.backup_count > 0:
+            self.path.replace(self.path.with_name(f"{self.path.name}.1"))
+        else:
+            self.path.unlink()
+        self.file = open(self.path, "ab")
+        self.size = 0
+
+    def close(self):
+        self.file.close()
+
+
+class LogPipeline:
+    """Owns the server's stdout: reader thread, batching writer thread and admin socket"""
+
+    def __init__(self, name: str = "server", echo: bool = True, log_dir: Path = LOG_DIR,
+                 admin_socket: str = ADMIN_SOCKET):
+        self.name = name
+        self.echo = echo
+        self.log_dir = Path(log_dir)
+        self.admin_socket = admin_socket or str(self.log_dir / f"{name}.sock")
+
+        self.pending = deque()
+        self.wakeup = threading.Event()
+        self.ring = deque(maxlen=RING_SIZE)
+        self.writer = None
+        self.writer_thread = None
+        self.reader_threads = []
+        self.server = None
+        self.should_run = False
+
+        self.dropped_chunks = 0
+        self.lines_written = 0
+
+    def start(self):
+        self.should_run = True
+        self.writer = RotatingWriter(self.log_dir / f"{self.name}.jsonl")
+        self.writer_thread = threading.Thread(target=self._write_loop, name="log-writer", daemon=True)
+        self.writer_thread.start()
+        self._start_admin_socket()
+
+    def attach(self, stream):
+        """Start draining a binary pipe (e.g. Popen(..., stdout=PIPE).stdout)"""
+        reader = threading.Thread(target=self._read_loop, args=(stream,), name="log-reader", daemon=True)
+        self.reader_threads = [t for t in self.reader_threads if t.is_alive()] + [reader]
+        reader.start()
+
+    def stop(self):
+        """Flush what the server has written so far; waits at most a few seconds"""
+        # Let readers hit EOF on an exiting server so its last lines are kept
+        deadline = time.monotonic() + STOP_TIMEOUT
+        for reader in self.reader_threads:
+            reader.join(timeout=max(0, deadline - time.monotonic()) / 2)
+        self.should_run = False
+        self.wakeup.set()
+        if self.writer_thread:
+            self.writer_thread.join(timeout=max(0.1, deadline - time.monotonic()))
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            try:
+                os.unlink(self.admin_socket)
+            except OSError:
+                pass
+
+    def _read_loop(self, stream):
+        fd = stream.fileno()
+        gap_bytes = 0
+        while True:
+            try:
+                chunk = os.read(fd, READ_CHUNK)
+            except OSError:
+                break
+            if not chunk:
+                break
+            if len(self.pending) >= MAX_PENDING_CHUNKS:
+                # Drop the newest output rather than splicing the queued stream
+                gap_bytes += len(chunk)
+                self.dropped_chunks += 1
+                continue
+            if gap_bytes:
+                # Resume at the next line boundary so no line is glued to another
+                newline = chunk.find(b"\n")
+                if newline < 0:
+                    gap_bytes += len(chunk)
+                    continue
+                self.pending.append(_Gap(gap_bytes + newline + 1))
+                gap_bytes = 0
+                chunk = chunk[newline + 1:]
+                if not chunk:
+                    continue
+            self.pending.append(chunk)
+            self.wakeup.set()
+        if gap_bytes:
+            self.pending.append(_Gap(gap_bytes))
+        # Flush any partial last line once the server exits
+        self.pending.append(b"\n")
+        self.wakeup.set()
+
+    def _write_loop(self):
+        partial = b""
+        while self.should_run or self.pending:
+            self.wakeup.wait(FLUSH_INTERVAL)
+            self.wakeup.clear()
+
+            items = []
+            while self.pending:
+                items.append(self.pending.popleft())
+            if not items:
+                continue
+
+            records = []
+            console = []
+
+            def add_lines(lines):
+                for raw in lines:
+                    line = raw.decode("utf-8", "replace").rstrip("\r")
+                    if not line.strip():
+                        continue
+                    records.append(json.dumps(parse_line(line), default=str))
+                    self.ring.append(line)
+                    console.append(f"[SERVER] {line}\n")
+
+            buffered = [partial]
+            for item in items:
+                if isinstance(item, _Gap):
+                    # The line in progress lost its tail; keep only complete lines
+                    *lines, _ = b"".join(buffered).split(b"\n")
+                    add_lines(lines)
+                    buffered = []
+                    message = f"dropped {item.dropped_bytes} bytes of server output"
+                    records.append(json.dumps({"ts": time.time(), "level": "WARNING", "msg": "dropped",
+                                               "dropped_bytes": item.dropped_bytes}))
+                    self.ring.append(message)
+                    console.append(f"[LOGS] {message}\n")
+                else:
+                    buffered.append(item)
+            *lines, partial = b"".join(buffered).split(b"\n")
+            add_lines(lines)
+
+            if not records:
+                continue
+            try:
+                self.writer.write(("\n".join(records) + "\n").encode("utf-8"))
+                self.lines_written += len(records)
+            except OSError as e:
+                print(f"Log write failed: {e}")
+            if self.echo:
+                sys.stdout.write("".join(console))
+                sys.stdout.flush()
+        self.writer.close()
+
+    def stats(self) -> dict:
+        return {
+            "lines_written": self.lines_written,
+            "dropped_chunks": self.dropped_chunks,
+            "pending_chunks": len(self.pending),
+            "ring_lines": len(self.ring),
+            "log_file": str(self.writer.path) if self.writer else None,
+        }
+
+    def _start_admin_socket(self):
+        if not hasattr(socket, "AF_UNIX"):
+            return
+        pipeline = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                command = self.rfile.readline().decode("utf-8", "replace").split()
+                if command and command[0] == "stats":
+                    reply = json.dumps(pipeline.stats()) + "\n"
+                else:
+                    count = int(command[1]) if len(command) > 1 and command[1].isdigit() else 100
+                    lines = list(pipeline.ring)[-count:]
+                    reply = "".join(f"{line}\n" for line in lines)
+                self.wfile.write(reply.encode("utf-8"))
+
+        try:
+            Path(self.admin_socket).parent.mkdir(parents=True, exist_ok=True)
+            if os.path.exists(self.admin_socket):
+                os.unlink(self.admin_socket)
+            self.server = socketserver.ThreadingUnixStreamServer(self.admin_socket, Handler)
+            self.server.daemon_threads = True
+        except OSError as e:
+            print(f"Log admin socket unavailable: {e}")
+            self.server = None
+            return
+        threading.Thread(target=self.server.serve_forever, name="log-admin", daemon=True).start()
+
+
+def query(command: str, admin_socket: str) -> str:
+    """Send one command to a running pipeline's admin socket"""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.settimeout(5)
+        client.connect(admin_socket)
+        client.sendall(f"{command}\n".encode("utf-8"))
+        client.shutdown(socket.SHUT_WR)
+        data = []
+        while True:
+            chunk = client.recv(READ_CHUNK)
+            if not chunk:
+                break
+            data.append(chunk)
+    return b"".join(data).decode("utf-8", "replace")
+
+
+if __name__ == "__main__":
+    name = sys.argv[1] if len(sys.argv) > 1 else "supervisor"
+    admin_socket = ADMIN_SOCKET or str(LOG_DIR / f"{name}.sock")
+    try:
+        sys.stdout.write(query(" ".join(sys.argv[2:]) or "tail", admin_socket))
+    except OSError as e:
+        print(f"Could not reach log pipeline at {admin_socket}: {e}")
+        sys.exit(1)
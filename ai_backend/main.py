@@ -7,20 +7,27 @@ Handles incoming calls, AI processing, and voice synthesis
 import os
 import asyncio
 import uuid
+import shutil
 from datetime import datetime
 from pathlib import Path
 import logging
 
 import psycopg2
 from fastapi import FastAPI, Request, HTTPException, Response
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 import httpx
 from twilio.rest import Client
-from twilio.twiml.voice_response import VoiceResponse, Gather
+from twilio.http.http_client import TwilioHttpClient
 import openai
 from pydub import AudioSegment
 
+from twiml import render_incoming_call, render_reprompt, render_reply
+from diagnostics import DIAGNOSTICS_ENABLED, install_diagnostics
+from health import DependencyProbe, ReadinessChecker
+from tts_cache import STAGE_PROMPTS, TTSCache, TTSPrefetcher
+from lead_import import IMPORT_DIR, LeadImport
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -37,6 +44,10 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Opt-in event-loop stall detection and sampling profiler
+if DIAGNOSTICS_ENABLED:
+    install_diagnostics(app)
+
 # Environment variables
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 ELEVENLABS_API_KEY = os.getenv("ELEVENLABS_API_KEY")
@@ -45,8 +56,22 @@ TWILIO_AUTH_TOKEN = os.getenv("TWILIO_AUTH_TOKEN")
 TWILIO_PHONE_NUMBER = os.getenv("TWILIO_PHONE_NUMBER")
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+# Handlers keep blocking work off the event loop (async OpenAI client,
+# asyncio.to_thread for psycopg2 and Twilio) so /health/live stays responsive;
+# these timeouts only bound how long a single call can hold a request
+PROVIDER_TIMEOUT = 15
+DB_CONNECT_TIMEOUT = 5
+
 # Initialize clients
-twilio_client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
+twilio_client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN, http_client=TwilioHttpClient(timeout=PROVIDER_TIMEOUT))
+_openai_client = None
+
+def get_openai_client() -> openai.AsyncOpenAI:
+    """Shared async client, created on first use so a missing key only fails that request"""
+    global _openai_client
+    if _openai_client is None:
+        _openai_client = openai.AsyncOpenAI(api_key=OPENAI_API_KEY, timeout=PROVIDER_TIMEOUT)
+    return _openai_client
 
 # Create audio directory
 AUDIO_DIR = Path("audio_files")
@@ -54,7 +79,7 @@ AUDIO_DIR.mkdir(exist_ok=True)
 
 # Database connection
 def get_db_connection():
-    return psycopg2.connect(DATABASE_URL)
+    return psycopg2.connect(DATABASE_URL, connect_timeout=DB_CONNECT_TIMEOUT)
 
 # Initialize database tables
 def init_db():
@@ -76,6 +101,10 @@ def init_db():
         )
     """)
     
+    # Written by batch_reprocess.py; kept apart from the live per-turn transcription
+    cur.execute("ALTER TABLE ai_calls ADD COLUMN IF NOT EXISTS retranscription TEXT")
+    cur.execute("ALTER TABLE ai_calls ADD COLUMN IF NOT EXISTS lead_analysis TEXT")
+    
     conn.commit()
     cur.close()
     conn.close()
@@ -90,27 +119,20 @@ async def transcribe_audio(audio_url: str) -> str:
             response = await client.get(audio_url)
             audio_data = response.content
         
-        # Save temporary audio file
-        temp_audio_path = AUDIO_DIR / f"temp_{uuid.uuid4()}.wav"
-        with open(temp_audio_path, "wb") as f:
-            f.write(audio_data)
-        
-        # Transcribe with OpenAI Whisper
-        client = openai.OpenAI(api_key=OPENAI_API_KEY)
-        with open(temp_audio_path, "rb") as audio_file:
-            transcript = client.audio.transcriptions.create(
-                model="whisper-1",
-                file=audio_file
-            )
-        
-        # Clean up temp file
-        temp_audio_path.unlink()
+        # Transcribe with OpenAI Whisper, uploading straight from memory
+        transcript = await get_openai_client().audio.transcriptions.create(
+            model="whisper-1",
+            file=("recording.wav", audio_data)
+        )
         
         return transcript.text
     except Exception as e:
         logger.error(f"Transcription error: {e}")
         return "I couldn't understand what you said."
 
+# Scripted wording lets the reply's closing question reuse cached audio
+SCRIPTED_QUESTIONS = "\n".join(f"- {prompt}" for prompts in STAGE_PROMPTS.values() for prompt in prompts)
+
 async def generate_ai_response(user_message: str, conversation_context: str = "") -> str:
     """Generate AI response using GPT-4o mini"""
     try:
@@ -125,15 +147,16 @@ Key conversation flow:
 5. Ask about must-have features
 6. Provide helpful guidance and next steps
 
-Keep responses conversational, friendly, and under 50 words. Always end with a relevant follow-up question."""
+Keep responses conversational, friendly, and under 50 words. Always end with a relevant follow-up question.
+When that question is one of these qualification questions, end with it exactly as written:
+""" + SCRIPTED_QUESTIONS
 
         messages = [
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": f"Context: {conversation_context}\nUser: {user_message}"}
         ]
         
-        client = openai.OpenAI(api_key=OPENAI_API_KEY)
-        response = client.chat.completions.create(
+        response = await get_openai_client().chat.completions.create(
             model="gpt-4o-mini",
             messages=messages,
             max_tokens=150,
@@ -145,51 +168,60 @@ Keep responses conversational, friendly, and under 50 words. Always end with a r
         logger.error(f"AI response error: {e}")
         return "I'm here to help you find your perfect home. What area are you interested in?"
 
+ELEVENLABS_VOICE_ID = "21m00Tcm4TlvDq8ikWAM"  # Adam voice
+ELEVENLABS_MODEL_ID = "eleven_flash_v2_5"
+ELEVENLABS_VOICE_SETTINGS = {
+    "stability": 0.5,
+    "similarity_boost": 0.8
+}
+
+async def synthesize_speech(text: str) -> bytes:
+    """Fetch mp3 audio for text from ElevenLabs, or None on failure"""
+    url = f"https://api.elevenlabs.io/v1/text-to-speech/{ELEVENLABS_VOICE_ID}"
+    
+    headers = {
+        "Accept": "audio/mpeg",
+        "Content-Type": "application/json",
+        "xi-api-key": ELEVENLABS_API_KEY
+    }
+    
+    data = {
+        "text": text,
+        "model_id": ELEVENLABS_MODEL_ID,
+        "voice_settings": ELEVENLABS_VOICE_SETTINGS
+    }
+    
+    async with httpx.AsyncClient() as client:
+        response = await client.post(url, json=data, headers=headers)
+    
+    if response.status_code == 200:
+        return response.content
+    logger.error(f"ElevenLabs error: {response.status_code}")
+    return None
+
+# Scripted-question audio cache, filled on demand and by the next-question prefetcher
+tts_cache = TTSCache(
+    AUDIO_DIR / "tts_cache",
+    f"{ELEVENLABS_VOICE_ID}:{ELEVENLABS_MODEL_ID}:{sorted(ELEVENLABS_VOICE_SETTINGS.items())}"
+)
+tts_prefetcher = TTSPrefetcher(tts_cache, synthesize_speech)
+
 async def text_to_speech(text: str, call_id: str) -> str:
     """Convert text to speech using ElevenLabs Flash v2.5"""
     try:
-        url = "https://api.elevenlabs.io/v1/text-to-speech/21m00Tcm4TlvDq8ikWAM"  # Adam voice
-        
-        headers = {
-            "Accept": "audio/mpeg",
-            "Content-Type": "application/json",
-            "xi-api-key": ELEVENLABS_API_KEY
-        }
-        
-        data = {
-            "text": text,
-            "model_id": "eleven_flash_v2_5",
-            "voice_settings": {
-                "stability": 0.5,
-                "similarity_boost": 0.8
-            }
-        }
-        
-        async with httpx.AsyncClient() as client:
-            response = await client.post(url, json=data, headers=headers)
-        
-        if response.status_code == 200:
-            audio_path = AUDIO_DIR / f"{call_id}.mp3"
-            with open(audio_path, "wb") as f:
-                f.write(response.content)
-            return str(audio_path)
-        else:
-            logger.error(f"ElevenLabs error: {response.status_code}")
+        audio = await tts_cache.speak(text, synthesize_speech)
+        if audio is None:
             return None
+        
+        audio_path = AUDIO_DIR / f"{call_id}.mp3"
+        await asyncio.to_thread(audio_path.write_bytes, audio)
+        return str(audio_path)
     except Exception as e:
         logger.error(f"Text-to-speech error: {e}")
         return None
 
-@app.post("/incoming-call")
-async def handle_incoming_call(request: Request):
-    """Handle incoming Twilio webhook calls"""
-    form_data = await request.form()
-    call_sid = form_data.get("CallSid")
-    caller_number = form_data.get("From")
-    
-    logger.info(f"Incoming call from {caller_number}, SID: {call_sid}")
-    
-    # Store initial call data
+# Call-record queries; each runs in a worker thread via asyncio.to_thread
+def record_incoming_call(call_sid, caller_number):
     conn = get_db_connection()
     cur = conn.cursor()
     cur.execute("""
@@ -200,28 +232,51 @@ async def handle_incoming_call(request: Request):
     conn.commit()
     cur.close()
     conn.close()
+
+def load_call_context(call_sid) -> str:
+    conn = get_db_connection()
+    cur = conn.cursor()
+    cur.execute("SELECT transcription, ai_response FROM ai_calls WHERE call_sid = %s", (call_sid,))
+    result = cur.fetchone()
+    cur.close()
+    conn.close()
     
-    # Create TwiML response for gathering speech
-    response = VoiceResponse()
+    if result and result[0]:
+        return f"Previous: User said '{result[0]}', AI replied '{result[1]}'"
+    return ""
+
+def save_call_turn(call_sid, speech_result: str, ai_reply: str, audio_path: str = None):
+    conn = get_db_connection()
+    cur = conn.cursor()
+    cur.execute("""
+        UPDATE ai_calls 
+        SET transcription = COALESCE(transcription || ' | ', '') || %s,
+            ai_response = COALESCE(ai_response || ' | ', '') || %s,
+            audio_file_path = COALESCE(%s, audio_file_path),
+            updated_at = CURRENT_TIMESTAMP
+        WHERE call_sid = %s
+    """, (speech_result, ai_reply, audio_path, call_sid))
+    conn.commit()
+    cur.close()
+    conn.close()
+
+@app.post("/incoming-call")
+async def handle_incoming_call(request: Request):
+    """Handle incoming Twilio webhook calls"""
+    form_data = await request.form()
+    call_sid = form_data.get("CallSid")
+    caller_number = form_data.get("From")
     
-    # Welcome message for trial accounts
-    welcome_msg = "Hello! You've reached Bayti, your AI real estate assistant. I'm here to help you find your perfect home. Please press any key to continue our conversation, then tell me how I can help you today."
+    logger.info(f"Incoming call from {caller_number}, SID: {call_sid}")
     
-    gather = Gather(
-        input="speech dtmf",
-        timeout=10,
-        speech_timeout="auto",
-        action=f"/process-speech?call_sid={call_sid}",
-        method="POST"
-    )
-    gather.say(welcome_msg, voice="Polly.Joanna")
-    response.append(gather)
+    # Store initial call data
+    await asyncio.to_thread(record_incoming_call, call_sid, caller_number)
     
-    # Fallback if no speech detected
-    response.say("I didn't hear anything. Please call back when you're ready to speak.", voice="Polly.Joanna")
-    response.hangup()
+    # Synthesize the location question while the caller listens to the greeting
+    tts_prefetcher.start_call(str(call_sid))
     
-    return Response(content=str(response), media_type="application/xml")
+    # Welcome message with speech gather, rendered from a precompiled template
+    return Response(content=render_incoming_call(call_sid), media_type="application/xml")
 
 @app.post("/process-speech")
 async def process_speech(request: Request):
@@ -234,75 +289,25 @@ async def process_speech(request: Request):
     
     if not speech_result:
         # No speech detected, ask again
-        response = VoiceResponse()
-        gather = Gather(
-            input="speech",
-            timeout=5,
-            speech_timeout="auto",
-            action=f"/process-speech?call_sid={call_sid}",
-            method="POST"
-        )
-        gather.say("I didn't catch that. Could you please repeat your question?", voice="Polly.Joanna")
-        response.append(gather)
-        response.hangup()
-        return Response(content=str(response), media_type="application/xml")
+        return Response(content=render_reprompt(call_sid), media_type="application/xml")
     
     # Get conversation context
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute("SELECT transcription, ai_response FROM ai_calls WHERE call_sid = %s", (call_sid,))
-    result = cur.fetchone()
-    
-    context = ""
-    if result and result[0]:
-        context = f"Previous: User said '{result[0]}', AI replied '{result[1]}'"
+    context = await asyncio.to_thread(load_call_context, call_sid)
     
     # Generate AI response
     ai_reply = await generate_ai_response(speech_result, context)
     
-    # Update database with transcription and AI response
-    cur.execute("""
-        UPDATE ai_calls 
-        SET transcription = COALESCE(transcription || ' | ', '') || %s,
-            ai_response = COALESCE(ai_response || ' | ', '') || %s,
-            updated_at = CURRENT_TIMESTAMP
-        WHERE call_sid = %s
-    """, (speech_result, ai_reply, call_sid))
-    conn.commit()
-    
     # Generate audio file
     audio_path = await text_to_speech(ai_reply, str(call_sid))
-    if audio_path:
-        cur.execute("""
-            UPDATE ai_calls SET audio_file_path = %s WHERE call_sid = %s
-        """, (audio_path, call_sid))
-        conn.commit()
-    
-    cur.close()
-    conn.close()
     
-    # Create TwiML response
-    response = VoiceResponse()
+    # Update database with transcription, AI response and audio file
+    await asyncio.to_thread(save_call_turn, call_sid, speech_result, ai_reply, audio_path)
     
-    # Play AI response
-    response.say(ai_reply, voice="Polly.Joanna")
-    
-    # Continue conversation
-    gather = Gather(
-        input="speech",
-        timeout=5,
-        speech_timeout="auto",
-        action=f"/process-speech?call_sid={call_sid}",
-        method="POST"
-    )
-    gather.say("What else would you like to know?", voice="Polly.Joanna")
-    response.append(gather)
+    # Prefetch the next scripted question while the caller answers this one
+    tts_prefetcher.observe_turn(str(call_sid), ai_reply)
     
-    # End call if no further input
-    response.say("Thank you for calling Bayti. Have a great day!", voice="Polly.Joanna")
-    response.hangup()
-    
-    return Response(content=str(response), media_type="application/xml")
+    # Play AI response and continue conversation
+    return Response(content=render_reply(call_sid, reply_text=ai_reply), media_type="application/xml")
 
 @app.get("/audio/{call_id}.mp3")
 async def serve_audio(call_id: str):
@@ -328,7 +333,8 @@ async def make_test_call(request: Request):
         
         logger.info(f"Making call to {to_number} with webhook URL: {webhook_url}")
         
-        call = twilio_client.calls.create(
+        call = await asyncio.to_thread(
+            twilio_client.calls.create,
             url=webhook_url,
             to=to_number,
             from_=str(TWILIO_PHONE_NUMBER)
@@ -339,9 +345,78 @@ async def make_test_call(request: Request):
         logger.error(f"Outbound call error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/call-logs")
-async def get_call_logs():
-    """Get recent AI call logs"""
+# Bulk lead imports, most recent last
+lead_imports = {}
+lead_import_tasks = set()
+MAX_TRACKED_IMPORTS = 100
+
+def run_lead_import(job: LeadImport):
+    conn = get_db_connection()
+    try:
+        job.run(conn)
+    finally:
+        conn.close()
+
+def campaign_exists(campaign_id: str) -> bool:
+    conn = get_db_connection()
+    cur = conn.cursor()
+    cur.execute("SELECT 1 FROM campaigns WHERE id = %s", (campaign_id,))
+    found = cur.fetchone()
+    cur.close()
+    conn.close()
+    return found is not None
+
+@app.post("/campaigns/{campaign_id}/leads/import")
+async def import_campaign_leads(campaign_id: str, request: Request):
+    """Start a bulk CSV/XLSX lead import into a campaign; poll /imports/{id} for progress"""
+    form = await request.form()
+    upload = form.get("file")
+    if upload is None or not getattr(upload, "filename", None):
+        raise HTTPException(status_code=400, detail="Upload a CSV or XLSX file as 'file'")
+    
+    file_format = Path(upload.filename).suffix.lower().lstrip(".")
+    if file_format not in ("csv", "xlsx"):
+        raise HTTPException(status_code=400, detail="Only .csv and .xlsx files are supported")
+    
+    if not await asyncio.to_thread(campaign_exists, campaign_id):
+        raise HTTPException(status_code=404, detail="Campaign not found")
+    
+    # Copy the spooled upload to our own file; parsing streams from disk in a worker thread
+    IMPORT_DIR.mkdir(exist_ok=True)
+    source_path = IMPORT_DIR / f"upload_{uuid.uuid4()}.{file_format}"
+    def save_upload():
+        with open(source_path, "wb") as f:
+            shutil.copyfileobj(upload.file, f, 1 << 20)
+    await asyncio.to_thread(save_upload)
+    
+    job = LeadImport(campaign_id, source_path, file_format)
+    lead_imports[job.id] = job
+    while len(lead_imports) > MAX_TRACKED_IMPORTS:
+        lead_imports.pop(next(iter(lead_imports)))
+    task = asyncio.create_task(asyncio.to_thread(run_lead_import, job))
+    lead_import_tasks.add(task)
+    task.add_done_callback(lead_import_tasks.discard)
+    
+    logger.info(f"Lead import {job.id} started for campaign {campaign_id} ({upload.filename})")
+    return JSONResponse(job.progress(), status_code=202)
+
+@app.get("/imports/{import_id}")
+async def get_import_progress(import_id: str):
+    """Progress and counts for a bulk lead import"""
+    job = lead_imports.get(import_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Import not found")
+    return job.progress()
+
+@app.get("/imports/{import_id}/rejects.csv")
+async def get_import_rejects(import_id: str):
+    """Rows that were rejected or suppressed, with the reason"""
+    job = lead_imports.get(import_id)
+    if not job or not job.rejects_path.exists():
+        raise HTTPException(status_code=404, detail="No rejected rows for this import")
+    return FileResponse(job.rejects_path, media_type="text/csv", filename=f"{import_id}_rejects.csv")
+
+def fetch_call_logs() -> list:
     conn = get_db_connection()
     cur = conn.cursor()
     
@@ -365,14 +440,69 @@ async def get_call_logs():
     
     cur.close()
     conn.close()
-    
+    return calls
+
+@app.get("/call-logs")
+async def get_call_logs():
+    """Get recent AI call logs"""
+    calls = await asyncio.to_thread(fetch_call_logs)
     return {"calls": calls}
 
+# Readiness probes - Postgres is required to serve calls, providers are reported only
+def _ping_db():
+    conn = psycopg2.connect(DATABASE_URL, connect_timeout=2)
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT 1")
+        cur.close()
+    finally:
+        conn.close()
+
+async def probe_database():
+    await asyncio.to_thread(_ping_db)
+
+async def _probe_http(url: str, **kwargs):
+    async with httpx.AsyncClient(timeout=2) as client:
+        response = await client.get(url, **kwargs)
+    if response.status_code >= 400:
+        raise RuntimeError(f"HTTP {response.status_code}")
+
+async def probe_openai():
+    await _probe_http("https://api.openai.com/v1/models", headers={"Authorization": f"Bearer {OPENAI_API_KEY}"})
+
+async def probe_elevenlabs():
+    await _probe_http("https://api.elevenlabs.io/v1/models", headers={"xi-api-key": ELEVENLABS_API_KEY or ""})
+
+async def probe_twilio():
+    await _probe_http(
+        f"https://api.twilio.com/2010-04-01/Accounts/{TWILIO_ACCOUNT_SID}.json",
+        auth=(TWILIO_ACCOUNT_SID or "", TWILIO_AUTH_TOKEN or "")
+    )
+
+readiness = ReadinessChecker([
+    DependencyProbe("postgres", probe_database),
+    DependencyProbe("openai", probe_openai, critical=False, ttl=30),
+    DependencyProbe("elevenlabs", probe_elevenlabs, critical=False, ttl=30),
+    DependencyProbe("twilio", probe_twilio, critical=False, ttl=30),
+])
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
     return {"status": "healthy", "service": "Bayti AI Calling Backend"}
 
+@app.get("/health/live")
+async def liveness_check():
+    """Liveness: the worker's event loop is responsive (no dependency calls)"""
+    return {"status": "alive"}
+
+@app.get("/health/ready")
+async def readiness_check():
+    """Readiness: dependencies needed to serve calls are reachable"""
+    result = await readiness.check()
+    result["service"] = "Bayti AI Calling Backend"
+    return JSONResponse(result, status_code=200 if result["ready"] else 503)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
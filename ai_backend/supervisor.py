@@ -13,15 +13,39 @@ import threading
 import requests
 from pathlib import Path
 
+from log_pipeline import LogPipeline
+from health import PROBE_TIMEOUT
+
 class AIBackendSupervisor:
     def __init__(self):
         self.process = None
         self.should_run = True
         self.restart_count = 0
         self.max_restarts = 10
-        self.base_delay = 2
+        self.base_delay = 0.5
         self.max_delay = 30
-        self.health_check_url = "http://localhost:8000/health"
+        self.liveness_url = "http://localhost:8000/health/live"
+        self.readiness_url = "http://localhost:8000/health/ready"
+        
+        # Sub-second liveness polling; handlers keep blocking calls off the event
+        # loop, so a worker that misses 4 polls over at least a second is hung
+        self.liveness_interval = 0.25
+        self.liveness_timeout = 0.25
+        self.liveness_failure_window = 1.0
+        self.min_liveness_failures = 4
+        self.terminate_timeout = 1
+        self.liveness_failures = 0
+        self.last_live = time.monotonic()
+        self.startup_timeout = 30
+        
+        # Readiness is polled on its own thread; cold probes may take PROBE_TIMEOUT
+        self.readiness_interval = 2
+        self.readiness_timeout = PROBE_TIMEOUT + 3
+        self.ready = False
+        self.ready_lock = threading.Lock()
+        self.session = requests.Session()
+        self.readiness_session = requests.Session()
+        self.logs = LogPipeline(name="supervisor")
         
     def signal_handler(self, sig, frame):
         print("Shutdown signal received")
@@ -29,15 +53,35 @@ class AIBackendSupervisor:
         if self.process:
             self.process.terminate()
             self.process.wait()
+        self.logs.stop()
         sys.exit(0)
         
     def health_check(self):
-        """Check if the server is responding"""
+        """Check if the server is alive (event loop answering requests)"""
         try:
-            response = requests.get(self.health_check_url, timeout=5)
+            response = self.session.get(self.liveness_url, timeout=self.liveness_timeout)
             return response.status_code == 200
-        except:
+        except requests.RequestException:
             return False
+    
+    def readiness_check(self):
+        """Check if the server's dependencies are up; returns (ready, details)"""
+        try:
+            response = self.readiness_session.get(self.readiness_url, timeout=self.readiness_timeout)
+            return response.status_code == 200, response.json()
+        except (requests.RequestException, ValueError) as e:
+            return False, {"error": str(e)}
+    
+    def wait_until_live(self):
+        """Poll liveness until the server answers or startup times out"""
+        deadline = time.monotonic() + self.startup_timeout
+        while self.should_run and time.monotonic() < deadline:
+            if self.process and self.process.poll() is not None:
+                return False
+            if self.health_check():
+                return True
+            time.sleep(self.liveness_interval)
+        return False
             
     def start_server_process(self):
         """Start the FastAPI server process"""
@@ -58,9 +102,9 @@ uvicorn.run(app, host='0.0.0.0', port=8000, log_level='info')
                 cmd,
                 cwd=Path(__file__).parent,
                 stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                universal_newlines=True
+                stderr=subprocess.STDOUT
             )
+            self.logs.attach(self.process.stdout)
             
             return True
             
@@ -73,16 +117,51 @@ uvicorn.run(app, host='0.0.0.0', port=8000, log_level='info')
         while self.should_run:
             if not self.process or self.process.poll() is not None:
                 print("Server process not running, restarting...")
+                self.set_ready(False, {"error": "process exited"})
                 self.restart_server()
+                self.last_live = time.monotonic()
+                continue
+            
+            time.sleep(self.liveness_interval)
+            if self.health_check():
+                self.liveness_failures = 0
+                self.last_live = time.monotonic()
             else:
-                # Check health every 30 seconds
-                time.sleep(30)
-                if not self.health_check():
-                    print("Health check failed, restarting server...")
+                self.liveness_failures += 1
+                if self.liveness_failures == 1:
+                    self.set_ready(False, {"error": "liveness check failed"})
+                down_for = time.monotonic() - self.last_live
+                if down_for >= self.liveness_failure_window and self.liveness_failures >= self.min_liveness_failures:
+                    print(f"Liveness failing for {down_for:.1f}s ({self.liveness_failures} checks), restarting server...")
                     if self.process:
                         self.process.terminate()
-                        self.process.wait()
+                        try:
+                            self.process.wait(timeout=self.terminate_timeout)
+                        except subprocess.TimeoutExpired:
+                            self.process.kill()
+                            self.process.wait()
                     self.restart_server()
+                    self.last_live = time.monotonic()
+    
+    def monitor_readiness(self):
+        """Poll readiness separately so a slow probe never delays liveness checks"""
+        while self.should_run:
+            time.sleep(self.readiness_interval)
+            if not self.process or self.process.poll() is not None or self.liveness_failures:
+                continue
+            # Alive but not ready (e.g. Postgres down) is not fixed by a restart;
+            # take the worker out of rotation until its dependencies recover
+            ready, details = self.readiness_check()
+            if not self.liveness_failures:
+                self.set_ready(ready, details)
+    
+    def set_ready(self, ready, details=None):
+        """Record readiness transitions; routing should only target ready workers"""
+        with self.ready_lock:
+            if ready != self.ready:
+                state = "READY" if ready else "NOT READY"
+                print(f"Server is {state}: {details}")
+            self.ready = ready
                     
     def restart_server(self):
         """Restart the server with exponential backoff"""
@@ -97,8 +176,8 @@ uvicorn.run(app, host='0.0.0.0', port=8000, log_level='info')
         
         if self.start_server_process():
             # Wait for server to start
-            time.sleep(5)
-            if self.health_check():
+            if self.wait_until_live():
+                self.liveness_failures = 0
                 print("Server restarted successfully")
                 self.restart_count = 0  # Reset on success
             else:
@@ -116,31 +195,37 @@ uvicorn.run(app, host='0.0.0.0', port=8000, log_level='info')
         print("Server will be monitored and auto-restarted")
         print("Press Ctrl+C to stop")
         
+        # Server output goes through the non-blocking log pipeline
+        self.logs.start()
+        
         # Start initial server
         if not self.start_server_process():
             print("Failed to start initial server")
             return
             
         # Wait for initial startup
-        time.sleep(5)
+        if not self.wait_until_live():
+            print("Server did not become live within startup timeout")
         
         # Start monitoring in background
         monitor_thread = threading.Thread(target=self.monitor_server)
         monitor_thread.daemon = True
         monitor_thread.start()
+        readiness_thread = threading.Thread(target=self.monitor_readiness)
+        readiness_thread.daemon = True
+        readiness_thread.start()
         
         try:
-            # Stream server output
-            if self.process and self.process.stdout:
-                for line in iter(self.process.stdout.readline, ''):
-                    if line.strip() and self.should_run:
-                        print(f"[SERVER] {line.strip()}")
+            # Server output is drained by the log pipeline threads
+            while self.should_run:
+                time.sleep(1)
         except KeyboardInterrupt:
             pass
         finally:
             self.should_run = False
             if self.process:
                 self.process.terminate()
+            self.logs.stop()
 
 if __name__ == "__main__":
     supervisor = AIBackendSupervisor()
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+TTS audio cache and predictive prefetch for Bayti AI Backend
+The agent is told to close its replies with the scripted qualification
+questions below, word for word. A reply is split into its free-form lead-in
+and that trailing question: the question's audio comes from the cache (and is
+prefetched while the caller is still talking), only the lead-in is
+synthesized per turn, and the two mp3 segments are joined.
+Only scripted questions are cached, so disk use stays bounded.
+"""
+
+import re
+import asyncio
+import hashlib
+import uuid
+import logging
+from collections import OrderedDict
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# Qualification sequence from the agent's system prompt, with the exact
+# wording the agent (and our fallback reply) use for each follow-up question
+FLOW_STAGES = ["location", "budget", "property_type", "features"]
+
+STAGE_PROMPTS = {
+    "location": [
+        "What area are you interested in?",
+        "What area or neighborhood are you interested in?",
+    ],
+    "budget": [
+        "What budget range are you working with?",
+    ],
+    "property_type": [
+        "What type of property are you looking for, such as a house, condo, or townhouse?",
+    ],
+    "features": [
+        "What must-have features are you looking for in your new home?",
+    ],
+}
+
+STAGE_KEYWORDS = {
+    "location": re.compile(r"\b(area|areas|neighborhood|neighbourhood|location|where)\b", re.I),
+    "budget": re.compile(r"\b(budget|price range|afford|spend)\b", re.I),
+    "property_type": re.compile(r"\b(type of (home|property)|property type|house|condo|apartment|townhouse|villa)\b", re.I),
+    "features": re.compile(r"\b(features|must-haves?|bedrooms?|bathrooms?|garage|pool|garden|amenities)\b", re.I),
+}
+
+MAX_PREFETCH_PER_CALL = 4
+MAX_CONCURRENT_PREFETCH = 2
+MAX_TRACKED_CALLS = 1000
+
+_TRAILING_QUESTION = re.compile(r"([^.!?]+\?)\s*$")
+
+
+def normalize_text(text: str) -> str:
+    """Cache key form: whitespace collapsed, case and curly apostrophes ignored"""
+    return " ".join(text.replace("’", "'").split()).casefold()
+
+
+SCRIPTED_TEXTS = frozenset(normalize_text(prompt) for prompts in STAGE_PROMPTS.values() for prompt in prompts)
+PROMPT_STAGES = {normalize_text(prompt): stage for stage, prompts in STAGE_PROMPTS.items() for prompt in prompts}
+
+
+def split_reply(text: str):
+    """(lead-in, trailing question) of a reply; question is None if it doesn't end with one"""
+    match = _TRAILING_QUESTION.search(text or "")
+    if not match:
+        return text, None
+    return text[:match.start(1)].strip(), match.group(1).strip()
+
+
+class TTSCache:
+    """Content-addressed mp3 files keyed by voice settings and text
+
+    Free-form LLM replies are rarely repeated, so only `texts` (the scripted
+    questions by default) are cached; that keeps disk use bounded.
+    """
+
+    def __init__(self, cache_dir: Path, voice_key: str, texts=SCRIPTED_TEXTS):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.voice_key = voice_key
+        self.texts = texts
+        self.hits = 0
+        self.misses = 0
+
+    def cacheable(self, text: str) -> bool:
+        return normalize_text(text) in self.texts
+
+    def path_for(self, text: str) -> Path:
+        digest = hashlib.sha256(f"{self.voice_key}\n{normalize_text(text)}".encode("utf-8")).hexdigest()
+        return self.cache_dir / f"{digest}.mp3"
+
+    def contains(self, text: str) -> bool:
+        return self.path_for(text).exists()
+
+    def get(self, text: str):
+        """Cached audio bytes, or None"""
+        try:
+            audio = self.path_for(text).read_bytes()
+        except OSError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return audio
+
+    def put(self, text: str, audio: bytes):
+        if not self.cacheable(text):
+            return
+        path = self.path_for(text)
+        # Write then rename so readers never see a partial file
+        tmp_path = path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+        tmp_path.write_bytes(audio)
+        tmp_path.replace(path)
+
+    async def speak(self, text: str, synthesize):
+        """Audio for a reply, reusing cached audio for its scripted trailing question"""
+        if self.cacheable(text):
+            return await self._cached(text, synthesize)
+        lead, question = split_reply(text)
+        if not lead or question is None or not self.cacheable(question):
+            return await synthesize(text)
+        # Same voice settings produce plain mp3 frames, so segments concatenate into one stream
+        lead_audio, question_audio = await asyncio.gather(synthesize(lead), self._cached(question, synthesize))
+        if lead_audio is None or question_audio is None:
+            return None
+        return lead_audio + question_audio
+
+    async def _cached(self, text: str, synthesize):
+        audio = await asyncio.to_thread(self.get, text)
+        if audio is None:
+            audio = await synthesize(text)
+            if audio:
+                await asyncio.to_thread(self.put, text, audio)
+        return audio
+
+
+def detect_stage(text: str):
+    """Latest qualification stage a piece of conversation touches, or None"""
+    stage = None
+    for index, name in enumerate(FLOW_STAGES):
+        if STAGE_KEYWORDS[name].search(text or ""):
+            stage = index
+    return stage
+
+
+class TTSPrefetcher:
+    """Tracks each call's position in the qualification flow and pre-synthesizes the next question
+
+    Each call records the questions predicted for it, and a prediction is
+    scored as a hit when the agent's next reply ends with one of them.
+    Synthesis a call triggers counts against its budget (`max_per_call`);
+    questions already cached or being fetched for another call are free, so
+    the budget only caps spend while the cache is cold.
+    """
+
+    def __init__(self, cache: TTSCache, synthesize, max_per_call: int = MAX_PREFETCH_PER_CALL,
+                 max_concurrent: int = MAX_CONCURRENT_PREFETCH):
+        # synthesize is an async callable text -> audio bytes (or None on failure)
+        self.cache = cache
+        self.synthesize = synthesize
+        self.max_per_call = max_per_call
+        self.semaphore = asyncio.Semaphore(max_concurrent)
+        self.calls = OrderedDict()
+        self.in_flight = set()
+        self.tasks = set()
+        self.prefetched = 0
+        self.skipped_budget = 0
+        self.predictions_hit = 0
+        self.predictions_missed = 0
+
+    def _state(self, call_sid: str) -> dict:
+        state = self.calls.get(call_sid)
+        if state is None:
+            state = {"stage": None, "spent": 0, "predicted": set()}
+            self.calls[call_sid] = state
+            if len(self.calls) > MAX_TRACKED_CALLS:
+                self.calls.popitem(last=False)
+        else:
+            self.calls.move_to_end(call_sid)
+        return state
+
+    def start_call(self, call_sid: str):
+        """Call answered: the greeting leads into the location question"""
+        self._schedule(self._state(call_sid), "location")
+
+    def observe_turn(self, call_sid: str, ai_reply: str):
+        """Score the call's prediction and advance its flow position from the agent's reply"""
+        state = self._state(call_sid)
+        _, question = split_reply(ai_reply)
+        key = normalize_text(question) if question else None
+        if state["predicted"]:
+            if key in state["predicted"]:
+                self.predictions_hit += 1
+            else:
+                self.predictions_missed += 1
+
+        # A scripted question pins the stage exactly; otherwise fall back to keywords
+        stage = FLOW_STAGES.index(PROMPT_STAGES[key]) if key in PROMPT_STAGES else detect_stage(ai_reply)
+        if stage is not None and (state["stage"] is None or stage > state["stage"]):
+            state["stage"] = stage
+        current = state["stage"] if state["stage"] is not None else -1
+        state["predicted"] = set()
+        if current + 1 < len(FLOW_STAGES):
+            self._schedule(state, FLOW_STAGES[current + 1])
+
+    def _schedule(self, state: dict, stage: str):
+        for prompt in STAGE_PROMPTS[stage]:
+            key = normalize_text(prompt)
+            state["predicted"].add(key)
+            if key in self.in_flight or self.cache.contains(prompt):
+                continue
+            if state["spent"] >= self.max_per_call:
+                self.skipped_budget += 1
+                continue
+            state["spent"] += 1
+            self.in_flight.add(key)
+            task = asyncio.create_task(self._prefetch(prompt, key))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    async def _prefetch(self, prompt: str, key: str):
+        try:
+            async with self.semaphore:
+                audio = await self.synthesize(prompt)
+            if audio:
+                await asyncio.to_thread(self.cache.put, prompt, audio)
+                self.prefetched += 1
+        except Exception as e:
+            logger.error(f"TTS prefetch error: {e}")
+        finally:
+            self.in_flight.discard(key)
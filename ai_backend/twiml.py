@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Precompiled TwiML responses for Bayti AI Backend
+Static call-flow documents are built once at import and only the
+dynamic parts (call SID, reply text, audio URLs) are escaped per request
+"""
+
+from xml.sax.saxutils import escape
+
+from twilio.twiml.voice_response import VoiceResponse, Gather
+
+VOICE = "Polly.Joanna"
+
+WELCOME_MESSAGE = "Hello! You've reached Bayti, your AI real estate assistant. I'm here to help you find your perfect home. Please press any key to continue our conversation, then tell me how I can help you today."
+NO_INPUT_MESSAGE = "I didn't hear anything. Please call back when you're ready to speak."
+REPROMPT_MESSAGE = "I didn't catch that. Could you please repeat your question?"
+FOLLOW_UP_MESSAGE = "What else would you like to know?"
+GOODBYE_MESSAGE = "Thank you for calling Bayti. Have a great day!"
+
+# Placeholders survive TwiML serialization unchanged and are split out below
+_CALL_SID = "__BAYTI_CALL_SID__"
+_REPLY_TEXT = "__BAYTI_REPLY_TEXT__"
+_PLAY_URL = "__BAYTI_PLAY_URL__"
+
+_ATTR_ENTITIES = {'"': "&quot;", "\r": "&#13;", "\n": "&#10;", "\t": "&#09;"}
+
+
+def _attr(value) -> str:
+    return escape(str(value), _ATTR_ENTITIES)
+
+
+def _text(value) -> str:
+    return escape(str(value))
+
+
+def _action(call_sid: str) -> str:
+    return f"/process-speech?call_sid={call_sid}"
+
+
+def build_incoming_call(call_sid) -> VoiceResponse:
+    """Build the welcome TwiML tree for a new call"""
+    response = VoiceResponse()
+    gather = Gather(
+        input="speech dtmf",
+        timeout=10,
+        speech_timeout="auto",
+        action=_action(call_sid),
+        method="POST"
+    )
+    gather.say(WELCOME_MESSAGE, voice=VOICE)
+    response.append(gather)
+
+    # Fallback if no speech detected
+    response.say(NO_INPUT_MESSAGE, voice=VOICE)
+    response.hangup()
+    return response
+
+
+def build_reprompt(call_sid) -> VoiceResponse:
+    """Build the "didn't catch that" TwiML tree"""
+    response = VoiceResponse()
+    gather = Gather(
+        input="speech",
+        timeout=5,
+        speech_timeout="auto",
+        action=_action(call_sid),
+        method="POST"
+    )
+    gather.say(REPROMPT_MESSAGE, voice=VOICE)
+    response.append(gather)
+    response.hangup()
+    return response
+
+
+def build_reply(call_sid, reply_text: str = None, play_url: str = None) -> VoiceResponse:
+    """Build the TwiML tree that speaks (or plays) a reply and keeps listening"""
+    response = VoiceResponse()
+    if play_url is not None:
+        response.play(play_url)
+    else:
+        response.say(reply_text, voice=VOICE)
+
+    # Continue conversation
+    gather = Gather(
+        input="speech",
+        timeout=5,
+        speech_timeout="auto",
+        action=_action(call_sid),
+        method="POST"
+    )
+    gather.say(FOLLOW_UP_MESSAGE, voice=VOICE)
+    response.append(gather)
+
+    # End call if no further input
+    response.say(GOODBYE_MESSAGE, voice=VOICE)
+    response.hangup()
+    return response
+
+
+class TwiMLTemplate:
+    """A serialized TwiML document split around its dynamic fields"""
+
+    def __init__(self, document: str, fields: dict):
+        # fields maps placeholder -> (name, escaper)
+        self.parts = []
+        self.slots = []
+        remaining = document
+        while True:
+            hits = [(remaining.find(p), p) for p in fields if p in remaining]
+            if not hits:
+                break
+            index, placeholder = min(hits)
+            self.parts.append(remaining[:index])
+            self.slots.append(fields[placeholder])
+            remaining = remaining[index + len(placeholder):]
+        self.parts.append(remaining)
+
+    def render(self, **values) -> str:
+        out = [self.parts[0]]
+        for (name, escaper), part in zip(self.slots, self.parts[1:]):
+            out.append(escaper(values[name]))
+            out.append(part)
+        return "".join(out)
+
+
+_INCOMING_CALL = TwiMLTemplate(
+    str(build_incoming_call(_CALL_SID)),
+    {_CALL_SID: ("call_sid", _attr)},
+)
+_REPROMPT = TwiMLTemplate(
+    str(build_reprompt(_CALL_SID)),
+    {_CALL_SID: ("call_sid", _attr)},
+)
+_SAY_REPLY = TwiMLTemplate(
+    str(build_reply(_CALL_SID, reply_text=_REPLY_TEXT)),
+    {_CALL_SID: ("call_sid", _attr), _REPLY_TEXT: ("reply_text", _text)},
+)
+_PLAY_REPLY = TwiMLTemplate(
+    str(build_reply(_CALL_SID, play_url=_PLAY_URL)),
+    {_CALL_SID: ("call_sid", _attr), _PLAY_URL: ("play_url", _text)},
+)
+
+
+def render_incoming_call(call_sid) -> str:
+    """Welcome TwiML for a new call"""
+    return _INCOMING_CALL.render(call_sid=call_sid)
+
+
+def render_reprompt(call_sid) -> str:
+    """Reprompt TwiML when no speech was captured"""
+    return _REPROMPT.render(call_sid=call_sid)
+
+
+def render_reply(call_sid, reply_text: str = None, play_url: str = None) -> str:
+    """Reply TwiML, using <Play> when an audio URL is available"""
+    if play_url is not None:
+        return _PLAY_REPLY.render(call_sid=call_sid, play_url=play_url)
+    return _SAY_REPLY.render(call_sid=call_sid, reply_text=reply_text)
+
+
+if __name__ == "__main__":
+    # Micro-benchmark: precompiled templates vs building the tree per request
+    import timeit
+
+    call_sid = "CA0123456789abcdef0123456789abcdef"
+    reply = "Great choice! Downtown has lovely condos & townhouses. What's your budget range?"
+
+    cases = [
+        ("incoming-call",
+         lambda: str(build_incoming_call(call_sid)),
+         lambda: render_incoming_call(call_sid)),
+        ("reprompt",
+         lambda: str(build_reprompt(call_sid)),
+         lambda: render_reprompt(call_sid)),
+        ("reply",
+         lambda: str(build_reply(call_sid, reply_text=reply)),
+         lambda: render_reply(call_sid, reply_text=reply)),
+    ]
+
+    number = 20000
+    print(f"{'document':<15}{'builder (us)':>15}{'template (us)':>16}{'speedup':>10}")
+    for name, builder, template in cases:
+        assert builder() == template(), f"{name} output differs from builder"
+        built = min(timeit.repeat(builder, number=number, repeat=3)) / number * 1e6
+        rendered = min(timeit.repeat(template, number=number, repeat=3)) / number * 1e6
+        print(f"{name:<15}{built:>15.2f}{rendered:>16.2f}{built / rendered:>9.1f}x")
@@ -0,0 +1,174 @@
+"""
+Tests for ai_backend/batch_reprocess.py against a stubbed psycopg2 connection
+
+The stub keeps ai_calls rows in memory and applies the scan filters and bulk
+UPDATEs the job issues, so tests assert on the resulting rows and checkpoint.
+"""
+
+import io
+import re
+import sys
+import json
+import wave
+import asyncio
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "ai_backend"))
+
+import batch_reprocess
+from batch_reprocess import BatchReprocessor, Checkpoint, FakeProviders
+
+START = datetime(2025, 8, 1, 9, 0)
+
+
+def make_rows():
+    rows = [
+        {"id": f"00000000-0000-0000-0000-00000000000{i}", "call_sid": f"CA{i}", "transcription": f"turn {i}",
+         "retranscription": None, "lead_analysis": None, "created_at": START + timedelta(minutes=i)}
+        for i in range(1, 4)
+    ]
+    # No created_at, so it has no scan position and must never be picked up
+    rows.append({"id": "00000000-0000-0000-0000-000000000009", "call_sid": "CA9", "transcription": "turn 9",
+                 "retranscription": None, "lead_analysis": None, "created_at": None})
+    return rows
+
+
+class FakeCursor:
+    def __init__(self, db):
+        self.db = db
+        self.pending = []
+
+    def execute(self, sql, params):
+        params = list(params)
+        rows = [row for row in self.db.rows if row["call_sid"] is not None]
+        if "created_at IS NOT NULL" in sql:
+            rows = [row for row in rows if row["created_at"] is not None]
+        if "COALESCE(retranscription, transcription) IS NOT NULL" in sql:
+            rows = [row for row in rows if (row["retranscription"] or row["transcription"]) is not None]
+        if "id = ANY" in sql:
+            ids = params.pop(0)
+            rows = [row for row in rows if row["id"] in ids]
+        if "(created_at, id) >" in sql:
+            position = (params.pop(0), params.pop(0))
+            rows = [row for row in rows if (row["created_at"].isoformat(), row["id"]) > position]
+        rows.sort(key=lambda row: (row["created_at"], row["id"]))
+        self.pending = [(row["id"], row["call_sid"], row["retranscription"] or row["transcription"], row["created_at"])
+                        for row in rows]
+
+    def fetchmany(self, size):
+        batch, self.pending = self.pending[:size], self.pending[size:]
+        return batch
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, db):
+        self.db = db
+
+    def cursor(self, name=None):
+        return FakeCursor(self.db)
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class FakeDatabase:
+    def __init__(self):
+        self.rows = make_rows()
+        self.write_batches = []
+
+    def connect(self, dsn):
+        return FakeConnection(self)
+
+    def execute_values(self, cur, sql, values, page_size=100):
+        column = re.search(r"SET (\w+) =", sql).group(1)
+        values = list(values)
+        self.write_batches.append(len(values))
+        by_sid = {row["call_sid"]: row for row in self.rows}
+        for call_sid, result in values:
+            by_sid[call_sid][column] = result
+
+    def row(self, call_sid):
+        return next(row for row in self.rows if row["call_sid"] == call_sid)
+
+
+class RecordingProviders(FakeProviders):
+    """Fake providers that record the audio they receive and fail recordings for given calls"""
+
+    def __init__(self, fail=()):
+        super().__init__(latency=0)
+        self.fail = set(fail)
+        self.formats = []
+
+    async def fetch_recording(self, call_sid):
+        if call_sid in self.fail:
+            raise RuntimeError("recording unavailable")
+        return await super().fetch_recording(call_sid)
+
+    async def transcribe(self, audio):
+        with wave.open(io.BytesIO(audio)) as wav:
+            self.formats.append((wav.getframerate(), wav.getnchannels(), wav.getsampwidth()))
+        return await super().transcribe(audio)
+
+
+def run_job(monkeypatch, db, mode, checkpoint_path, providers):
+    monkeypatch.setattr(batch_reprocess.psycopg2, "connect", db.connect)
+    monkeypatch.setattr(batch_reprocess.psycopg2.extras, "execute_values", db.execute_values)
+    job = BatchReprocessor(mode, providers, Checkpoint(checkpoint_path), batch_size=2, workers=1)
+    asyncio.run(job.run())
+    return job
+
+
+def test_transcribe_prepares_audio_and_writes_retranscription(monkeypatch, tmp_path):
+    db = FakeDatabase()
+    providers = RecordingProviders()
+    job = run_job(monkeypatch, db, "transcribe", tmp_path / "transcribe.json", providers)
+
+    # Stereo 8kHz recordings reach the provider as 16kHz mono 16-bit via the process pool
+    assert providers.formats == [(16000, 1, 2)] * 3
+    assert db.write_batches == [2, 1]
+    for call_sid in ("CA1", "CA2", "CA3"):
+        row = db.row(call_sid)
+        assert row["retranscription"] == "Fake transcription of 1.0s of audio"
+        assert row["transcription"] == f"turn {call_sid[2:]}"
+    assert db.row("CA9")["retranscription"] is None
+    assert job.stats["rows"] == 3 and job.stats["updated"] == 3
+
+
+def test_analyze_resumes_from_checkpoint(monkeypatch, tmp_path):
+    db = FakeDatabase()
+    first = db.rows[0]
+    checkpoint = Checkpoint(tmp_path / "analyze.json")
+    checkpoint.save([first["created_at"].isoformat(), first["id"]], {"rows": 1, "updated": 1}, [])
+
+    job = run_job(monkeypatch, db, "analyze", checkpoint.path, RecordingProviders())
+
+    assert db.row("CA1")["lead_analysis"] is None
+    assert json.loads(db.row("CA2")["lead_analysis"])["chars"] == len("turn 2")
+    assert json.loads(db.row("CA3")["lead_analysis"])["chars"] == len("turn 3")
+    assert job.stats["rows"] == 3 and job.stats["updated"] == 3
+
+
+def test_failed_rows_are_retried_on_next_run(monkeypatch, tmp_path):
+    db = FakeDatabase()
+    checkpoint_path = tmp_path / "transcribe.json"
+
+    job = run_job(monkeypatch, db, "transcribe", checkpoint_path, RecordingProviders(fail={"CA2"}))
+    saved = json.loads(checkpoint_path.read_text())
+    assert saved["failed"] == [db.row("CA2")["id"]]
+    assert saved["position"] == [db.row("CA3")["created_at"].isoformat(), db.row("CA3")["id"]]
+    assert db.row("CA2")["retranscription"] is None
+    assert job.stats["failed"] == 1
+
+    job = run_job(monkeypatch, db, "transcribe", checkpoint_path, RecordingProviders())
+    saved = json.loads(checkpoint_path.read_text())
+    assert saved["failed"] == []
+    assert db.row("CA2")["retranscription"] == "Fake transcription of 1.0s of audio"
+    assert job.stats["retried"] == 1 and job.stats["failed"] == 0
+    assert job.stats["updated"] == 3
@@ -0,0 +1,126 @@
+"""
+Tests for ai_backend/lead_import.py against a stubbed psycopg2 connection
+"""
+
+import io
+import csv
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "ai_backend"))
+
+import lead_import
+from lead_import import LeadImport, PhoneSet, _CopyStream, normalize_phone
+
+
+def test_normalize_phone():
+    assert normalize_phone("+971 50 123 4567") == 971501234567
+    assert normalize_phone("00 44 20 7123 4567") == 442071234567
+    assert normalize_phone("050-123-4567") == 971501234567
+    assert normalize_phone("501234567") == 971501234567
+    assert normalize_phone("04 123 4567") == 97141234567
+    assert normalize_phone("971501234567") == 971501234567
+    # Unprefixed but too short to be national, or too long and not ours
+    assert normalize_phone("12345") is None
+    assert normalize_phone("2125551234") is None
+    assert normalize_phone("") is None
+    assert normalize_phone("n/a") is None
+
+
+def test_phone_set_grows_and_deduplicates():
+    phones = PhoneSet()
+    initial_slots = len(phones.slots)
+    numbers = [971500000000 + i * 7919 for i in range(initial_slots)]
+    assert all(phones.add(number) for number in numbers)
+    assert len(phones.slots) > initial_slots
+    assert len(phones) == len(numbers)
+    assert not phones.add(numbers[123])
+    assert numbers[-1] in phones
+    assert 0 not in phones and 971500000001 not in phones
+
+
+def test_copy_stream_reads_exact_sizes_across_lines():
+    stream = _CopyStream(iter(["ab\n", "cdef\n", "g\n"]))
+    assert stream.read(4) == b"ab\nc"
+    assert stream.read(3) == b"def"
+    assert stream.read(100) == b"\ng\n"
+    assert stream.read(4) == b""
+
+
+class FakeCursor:
+    def __init__(self, db, name):
+        self.db = db
+        self.name = name
+        self.itersize = None
+        self.rows = []
+
+    def execute(self, sql, params=()):
+        self.rows = self.db.suppressions if "suppressions" in sql else self.db.existing
+
+    def __iter__(self):
+        return iter([(phone,) for phone in self.rows])
+
+    def copy_expert(self, sql, stream, size=8192):
+        data = []
+        while True:
+            chunk = stream.read(size)
+            if not chunk:
+                break
+            data.append(chunk)
+        self.db.copied.extend(csv.reader(io.StringIO(b"".join(data).decode("utf-8"))))
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, existing=(), suppressions=()):
+        self.existing = list(existing)
+        self.suppressions = list(suppressions)
+        self.copied = []
+        self.committed = False
+
+    def cursor(self, name=None):
+        return FakeCursor(self, name)
+
+    def commit(self):
+        self.committed = True
+
+    def rollback(self):
+        pass
+
+
+def test_import_copies_new_leads_and_writes_rejects(monkeypatch, tmp_path):
+    monkeypatch.setattr(lead_import, "IMPORT_DIR", tmp_path)
+    source = tmp_path / "upload.csv"
+    source.write_text(
+        "Name,Mobile,Email,Budget\n"
+        "Amal,050 123 4567,amal@example.com,2M\n"
+        "Amal again,+971501234567,,\n"
+        "Existing,+971 50 765 4321,,\n"
+        "Blocked,0551112222,,\n"
+        "Junk,12345,,\n"
+        ",,,\n"
+        "Omar,00442071234567,,\n",
+        encoding="utf-8"
+    )
+    conn = FakeConnection(existing=["+971507654321"], suppressions=["+971551112222"])
+
+    job = LeadImport("campaign-1", source, "csv")
+    job.run(conn)
+
+    assert job.status == "completed" and conn.committed
+    assert conn.copied == [
+        ["campaign-1", "Amal", "+971501234567", "amal@example.com", "", '{"Budget": "2M"}'],
+        ["campaign-1", "Omar", "+442071234567", "", "", ""],
+    ]
+    assert (job.rows_read, job.accepted, job.duplicates, job.suppressed, job.rejected) == (7, 2, 2, 1, 1)
+
+    with open(job.rejects_path, newline="", encoding="utf-8") as f:
+        rejects = list(csv.reader(f))
+    assert rejects == [
+        ["row", "reason", "original"],
+        ["5", "Suppressed number", "Blocked", "0551112222", "", ""],
+        ["6", 'Invalid phone number "12345"', "Junk", "12345", "", ""],
+    ]
+    assert not source.exists()
@@ -0,0 +1,91 @@
+"""
+Tests for ai_backend/tts_cache.py with a fake synthesizer
+"""
+
+import sys
+import asyncio
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "ai_backend"))
+
+from tts_cache import TTSCache, TTSPrefetcher, split_reply
+
+
+class FakeSynth:
+    def __init__(self):
+        self.texts = []
+
+    async def __call__(self, text):
+        self.texts.append(text)
+        return f"<{text}>".encode("utf-8")
+
+
+async def settle(prefetcher):
+    while prefetcher.tasks:
+        await asyncio.gather(*prefetcher.tasks)
+
+
+def test_split_reply():
+    assert split_reply("Great choice! Downtown is lovely. What budget range are you working with?") == (
+        "Great choice! Downtown is lovely.", "What budget range are you working with?")
+    assert split_reply("Thanks for calling.") == ("Thanks for calling.", None)
+
+
+def test_prefetched_question_makes_realistic_reply_a_cache_hit(tmp_path):
+    async def scenario():
+        synth = FakeSynth()
+        cache = TTSCache(tmp_path, "voice")
+        prefetcher = TTSPrefetcher(cache, synth)
+
+        prefetcher.start_call("CA1")
+        prefetcher.observe_turn("CA1", "Welcome to Bayti! What area are you interested in?")
+        await settle(prefetcher)
+        assert "What budget range are you working with?" in synth.texts
+
+        synth.texts.clear()
+        reply = "Dubai Marina is a wonderful choice, with lovely waterfront towers.  What budget range are you working with?"
+        audio = await cache.speak(reply, synth)
+        prefetcher.observe_turn("CA1", reply)
+
+        lead = "Dubai Marina is a wonderful choice, with lovely waterfront towers."
+        assert audio == f"<{lead}><What budget range are you working with?>".encode("utf-8")
+        assert synth.texts[0] == lead
+        assert cache.hits == 1
+        assert prefetcher.predictions_hit == 2
+        assert prefetcher.predictions_missed == 0
+        await settle(prefetcher)
+
+    asyncio.run(scenario())
+
+
+def test_free_form_replies_are_not_cached(tmp_path):
+    async def scenario():
+        synth = FakeSynth()
+        cache = TTSCache(tmp_path, "voice")
+        audio = await cache.speak("Lovely! Would you like a viewing this weekend?", synth)
+        assert audio == b"<Lovely! Would you like a viewing this weekend?>"
+        assert list(tmp_path.iterdir()) == []
+
+    asyncio.run(scenario())
+
+
+def test_prefetch_budget_is_per_call(tmp_path):
+    async def scenario():
+        synth = FakeSynth()
+        prefetcher = TTSPrefetcher(TTSCache(tmp_path, "voice"), synth, max_per_call=1)
+
+        prefetcher.start_call("CA1")
+        await settle(prefetcher)
+        assert len(synth.texts) == 1
+        assert prefetcher.skipped_budget == 1
+
+        # A second call has its own budget; the question CA1 already paid for is free
+        prefetcher.start_call("CA2")
+        await settle(prefetcher)
+        assert len(synth.texts) == 2
+        prefetcher.observe_turn("CA2", "What area are you interested in?")
+        await settle(prefetcher)
+        assert len(synth.texts) == 2
+        assert prefetcher.skipped_budget == 2
+
+    asyncio.run(scenario())